@@ -0,0 +1,128 @@
+import errno
+import hashlib
+import os
+
+from tiktok_dl import blobstore
+from tiktok_dl.blobstore import BlobStore
+
+
+def add(store: BlobStore, url: str, content: bytes):
+    tmp = store.temp_path()
+    with open(tmp, "wb") as f:
+        f.write(content)
+    return store.add(url, tmp, hashlib.sha256(content).hexdigest())
+
+
+def test_lookup_known_url(tmp_path):
+    store = BlobStore(str(tmp_path / ".blobs"))
+    assert store.lookup("https://example/a.jpg") is None
+
+    blob = add(store, "https://example/a.jpg", b"cover")
+    assert store.lookup("https://example/a.jpg") == blob
+
+    reloaded = BlobStore(str(tmp_path / ".blobs"))
+    assert reloaded.lookup("https://example/a.jpg") == blob
+
+
+def test_same_content_from_different_urls(tmp_path):
+    store = BlobStore(str(tmp_path / ".blobs"))
+    first = add(store, "https://example/a.mp4", b"video")
+    second = add(store, "https://example/b.mp4", b"video")
+
+    assert first == second
+    assert os.listdir(os.path.dirname(first)) == [os.path.basename(first)]
+    assert os.listdir(os.path.join(str(tmp_path / ".blobs"), "tmp")) == []
+    assert BlobStore(str(tmp_path / ".blobs")).lookup("https://example/b.mp4") == first
+
+
+def test_empty_content_is_not_stored(tmp_path):
+    store = BlobStore(str(tmp_path / ".blobs"))
+    assert add(store, "https://example/a.jpg", b"") is None
+    assert store.lookup("https://example/a.jpg") is None
+
+
+def test_link_prefers_reflink(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / ".blobs"))
+    blob = add(store, "https://example/a.jpg", b"cover")
+    calls = list()
+
+    class FakeFcntl:
+        @staticmethod
+        def ioctl(fd, request, arg):
+            calls.append(request)
+            os.write(fd, b"cover")
+
+    monkeypatch.setattr(blobstore, "fcntl", FakeFcntl)
+    dest = str(tmp_path / "a.jpg")
+    store.link(blob, dest)
+
+    assert calls == [blobstore.FICLONE]
+    assert os.stat(dest).st_nlink == 1
+    assert open(dest, "rb").read() == b"cover"
+
+
+def test_link_falls_back_to_hardlink(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / ".blobs"))
+    blob = add(store, "https://example/a.jpg", b"cover")
+
+    class NoReflink:
+        @staticmethod
+        def ioctl(fd, request, arg):
+            raise OSError(errno.EOPNOTSUPP, "reflink not supported")
+
+    monkeypatch.setattr(blobstore, "fcntl", NoReflink)
+    dest = str(tmp_path / "a.jpg")
+    store.link(blob, dest)
+
+    assert os.path.samefile(blob, dest)
+
+
+def test_link_falls_back_to_copy(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / ".blobs"))
+    blob = add(store, "https://example/a.jpg", b"cover")
+
+    def cross_device(src, dst):
+        raise OSError(errno.EXDEV, "cross-device link")
+
+    monkeypatch.setattr(blobstore, "fcntl", None)
+    monkeypatch.setattr(os, "link", cross_device)
+    dest = str(tmp_path / "a.jpg")
+    store.link(blob, dest)
+
+    assert not os.path.samefile(blob, dest)
+    assert open(dest, "rb").read() == b"cover"
+
+
+def test_link_keeps_existing_file(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path / ".blobs"))
+    blob = add(store, "https://example/a.jpg", b"cover")
+    dest = tmp_path / "a.jpg"
+    dest.write_bytes(b"existing")
+
+    monkeypatch.setattr(blobstore, "fcntl", None)
+    store.link(blob, str(dest))
+    assert dest.read_bytes() == b"existing"
+
+
+def test_downloader_skips_known_url(tmp_path, monkeypatch):
+    from tiktok_dl.downloader import Downloader
+
+    jpeg = b"\xff\xd8\xff\xe0" + b"\x00" * 64 + b"\xff\xd9"
+    fetched = list()
+
+    def stream_to_file(url, handle, digest=None):
+        fetched.append(url)
+        handle.write(jpeg)
+        digest.update(jpeg)
+        return len(jpeg)
+
+    downloader = Downloader(dedup=True, directory_prefix=str(tmp_path))
+    monkeypatch.setattr(downloader, "_stream_to_file", stream_to_file)
+
+    first = str(tmp_path / "a" / "1.jpg")
+    second = str(tmp_path / "b" / "2.jpg")
+    assert downloader._download_url("https://example/cover.jpg", first) is None
+    assert downloader._download_url("https://example/cover.jpg", second) is None
+
+    assert fetched == ["https://example/cover.jpg"]
+    assert open(second, "rb").read() == jpeg
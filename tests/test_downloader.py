@@ -0,0 +1,106 @@
+import json
+import os
+
+import pytest
+
+from tiktok_dl.archive import ArchiveManager
+from tiktok_dl.downloader import Downloader
+
+URL = "https://www.tiktok.com/@someone/video/6812345678901234567"
+
+
+def page(video_id: str):
+    return {
+        "video_data": {
+            "id": video_id,
+            "user_id": "1",
+            "create_time": 1590000000,
+            "webpage_url": "https://www.tiktok.com/@someone/video/" + video_id,
+            "play_urls": ["https://example/video.mp4"],
+            "thumbnails": ["https://example/cover.jpg"],
+        },
+        "aweme_data": {},
+    }
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """
+    Replace the network parts of Downloader so `download` only goes
+    through the archive and metadata bookkeeping.
+    """
+    requested = list()
+
+    def fetch_data(self, url):
+        requested.append(url)
+        return page(url.rsplit("/", 1)[1])
+
+    monkeypatch.setattr(Downloader, "_fetch_data", fetch_data)
+    monkeypatch.setattr("tiktok_dl.downloader.aweme_validate", lambda data: None)
+    monkeypatch.setattr(
+        Downloader, "_output_format", lambda self, data: "someone/" + data["id"]
+    )
+    monkeypatch.setattr(
+        Downloader,
+        "_download_media",
+        lambda self, data, filepath: {"video": None, "thumbnail": None},
+    )
+    return requested
+
+
+def test_archive_waits_for_metadata_flush(tmp_path, offline):
+    archive = str(tmp_path / "archive.txt")
+    downloader = Downloader(
+        directory_prefix=str(tmp_path),
+        download_archive=archive,
+        metadata_store=str(tmp_path / "store.db"),
+    )
+    downloader.metadata.batch_size = 2
+
+    downloader.download(URL[:-1] + "1")
+    assert ArchiveManager(archive).archive == list()
+
+    downloader.download(URL[:-1] + "2")
+    assert ArchiveManager(archive).exist("6812345678901234561")
+    assert ArchiveManager(archive).exist("6812345678901234562")
+
+    downloader.download(URL[:-1] + "3")
+    assert not ArchiveManager(archive).exist("6812345678901234563")
+    downloader.close()
+    assert ArchiveManager(archive).exist("6812345678901234563")
+
+
+def test_archive_without_metadata_store(tmp_path, offline):
+    archive = str(tmp_path / "archive.txt")
+    downloader = Downloader(directory_prefix=str(tmp_path), download_archive=archive)
+    downloader.download(URL)
+    assert ArchiveManager(archive).exist("6812345678901234567")
+
+
+@pytest.mark.parametrize("prefix", ["out", None])
+@pytest.mark.parametrize("store", ["store.db", "store.jsonl.gz", None])
+def test_verify_requeues_broken_files(tmp_path, monkeypatch, offline, prefix, store):
+    monkeypatch.chdir(str(tmp_path))
+    downloader = Downloader(directory_prefix=prefix, metadata_store=store)
+
+    broken = downloader._expand_path(os.path.join("someone", "1.mp4"))
+    orphan = downloader._expand_path(os.path.join("someone", "2.mp4"))
+    os.makedirs(os.path.dirname(broken))
+    for path in (broken, orphan):
+        with open(path, "wb") as f:
+            f.write(b"<html></html>")
+
+    data = page("6812345678901234561")
+    if store is None:
+        with open(os.path.splitext(broken)[0] + ".json", "w") as f:
+            json.dump(data, f)
+    else:
+        downloader.metadata.append(data, "someone/1")
+
+    urls = downloader.verify(workers=2)
+    downloader.close()
+
+    assert urls == [data["video_data"]["webpage_url"]]
+    assert offline == urls
+    assert not os.path.exists(broken)
+    assert os.path.exists(orphan)
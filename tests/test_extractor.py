@@ -0,0 +1,114 @@
+from tiktok_dl.extractor import (
+    AwemeRecord,
+    aweme_extract_many,
+    aweme_extract_record,
+    aweme_extractor,
+)
+
+PAGE = {
+    "statusCode": 0,
+    "shareMeta": {"desc": "a video #fyp"},
+    "videoData": {
+        "itemInfos": {
+            "id": "6812345678901234567",
+            "createTime": "1590000000",
+            "covers": ["https://p16.example/cover.jpeg"],
+            "commentCount": 12,
+            "diggCount": "345",
+            "shareCount": 6,
+            "playCount": 7890,
+            "video": {
+                "urls": ["https://v16.example/video.mp4"],
+                "videoMeta": {"width": 576, "height": 1024, "duration": 15},
+            },
+        },
+        "authorInfos": {
+            "userId": 6700000000000000000,
+            "uniqueId": "someone",
+            "nickName": "Some One",
+            "secUid": "MS4wLjABAAAA",
+            "covers": ["https://p16.example/avatar.jpeg"],
+        },
+        "authorStats": {"followerCount": 1000, "heartCount": 50000},
+        "musicInfos": {
+            "musicId": 6800000000000000000,
+            "musicName": "original sound",
+            "authorName": "Some One",
+            "covers": ["https://p16.example/music.jpeg"],
+        },
+        "challengeInfoList": [{"challengeName": "fyp"}],
+        "duetInfo": "0",
+        "textExtra": [{"hashtagName": "fyp"}],
+    },
+}
+
+EXPECTED = {
+    "id": "6812345678901234567",
+    "play_urls": ["https://v16.example/video.mp4"],
+    "ext": "mp4",
+    "width": 576,
+    "height": 1024,
+    "duration": 15,
+    "thumbnails": ["https://p16.example/cover.jpeg"],
+    "comment_count": 12,
+    "digg_count": 345,
+    "share_count": 6,
+    "play_count": 7890,
+    "create_time": 1590000000,
+    "upload_date": "20200520",
+    "title": "Some One on TikTok",
+    "description": "a video #fyp",
+    "nick_name": "Some One",
+    "unique_id": "someone",
+    "sec_uid": "MS4wLjABAAAA",
+    "user_id": "6700000000000000000",
+    "user_url": "https://www.tiktok.com/@someone",
+    "profile_pics": ["https://p16.example/avatar.jpeg"],
+    "webpage_url": "https://www.tiktok.com/@someone/video/6812345678901234567?source=h5_t",
+    "follower_count": 1000,
+    "heart_total": "50000",
+    "challenge_list": [{"challengeName": "fyp"}],
+    "duet_info": "0",
+    "text_extra": [{"hashtagName": "fyp"}],
+    "music_id": "6800000000000000000",
+    "music_title": "original sound",
+    "music_artist": "Some One",
+    "music_covers": ["https://p16.example/music.jpeg"],
+}
+
+
+def test_aweme_extractor():
+    data = aweme_extractor(PAGE)
+    assert data == EXPECTED
+    assert list(data) == list(EXPECTED)
+
+
+def test_aweme_extractor_wrong_types():
+    page = {
+        "shareMeta": {},
+        "videoData": {
+            "itemInfos": dict(PAGE["videoData"]["itemInfos"], video="missing"),
+            "authorInfos": PAGE["videoData"]["authorInfos"],
+            "duetInfo": 0,
+        },
+    }
+    data = aweme_extractor(page)
+    assert data["play_urls"] is None
+    assert data["width"] is None
+    assert data["description"] is None
+    assert data["duet_info"] is None
+    assert data["music_id"] is None
+    assert data["follower_count"] is None
+
+
+def test_aweme_extract_record():
+    record = aweme_extract_record(PAGE)
+    assert isinstance(record, AwemeRecord)
+    assert record.webpage_url == EXPECTED["webpage_url"]
+    assert record.as_dict() == EXPECTED
+
+
+def test_aweme_extract_many():
+    assert aweme_extract_many([PAGE, PAGE]) == [EXPECTED, EXPECTED]
+    records = aweme_extract_many([PAGE], as_dict=False)
+    assert [r.as_dict() for r in records] == [EXPECTED]
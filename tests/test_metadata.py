@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from tiktok_dl.metadata import (
+    JsonLinesMetadataStore,
+    SQLiteMetadataStore,
+    export_sidecars,
+    open_metadata_store,
+)
+
+
+def video(i: int):
+    return {
+        "video_data": {
+            "id": str(i),
+            "user_id": "u%d" % (i % 2),
+            "create_time": 1590000000 + i,
+            "webpage_url": "https://www.tiktok.com/@someone/video/%d" % i,
+        },
+        "aweme_data": {"statusCode": 0},
+    }
+
+
+@pytest.fixture(params=["store.jsonl.gz", "store.db"])
+def store_path(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def test_open_metadata_store(tmp_path):
+    with open_metadata_store(str(tmp_path / "a.db")) as store:
+        assert isinstance(store, SQLiteMetadataStore)
+    with open_metadata_store(str(tmp_path / "a.jsonl.gz")) as store:
+        assert isinstance(store, JsonLinesMetadataStore)
+
+
+def test_batching(store_path):
+    store = open_metadata_store(store_path, batch_size=3)
+    for i in range(4):
+        store.append(video(i), "user/%d" % i)
+    assert len(store.pending) == 1
+    assert len(list(store.records())) == 3
+    store.close()
+
+    with open_metadata_store(store_path) as store:
+        assert len(list(store.records())) == 4
+
+
+def test_round_trip(store_path):
+    with open_metadata_store(store_path, batch_size=2) as store:
+        for i in range(5):
+            store.append(video(i), "user/%d" % i)
+
+    with open_metadata_store(store_path) as store:
+        records = sorted(store.records(), key=lambda r: r["id"])
+
+    assert [r["id"] for r in records] == ["0", "1", "2", "3", "4"]
+    assert records[3]["user_id"] == "u1"
+    assert records[3]["create_time"] == 1590000003
+    assert records[3]["filepath"] == os.path.join("user", "3")
+    assert records[3]["data"] == video(3)
+
+
+def test_sqlite_replaces_same_id(tmp_path):
+    path = str(tmp_path / "store.db")
+    with open_metadata_store(path) as store:
+        store.append(video(1), "old/1")
+        store.flush()
+        store.append(video(1), "new/1")
+
+    with open_metadata_store(path) as store:
+        assert [r["filepath"] for r in store.records()] == [os.path.join("new", "1")]
+
+
+def test_export_sidecars(store_path, tmp_path):
+    with open_metadata_store(store_path) as store:
+        for i in range(3):
+            store.append(video(i), "user/%d" % i)
+
+    out = tmp_path / "out"
+    with open_metadata_store(store_path) as store:
+        assert export_sidecars(store, directory_prefix=str(out)) == 3
+
+    with open(str(out / "user" / "2.json"), encoding="utf-8") as f:
+        assert json.load(f) == video(2)
+
+
+def test_jsonl_truncated_batch(tmp_path):
+    path = str(tmp_path / "store.jsonl.gz")
+    with open_metadata_store(path, batch_size=2) as store:
+        for i in range(4):
+            store.append(video(i), "user/%d" % i)
+
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.truncate(size - 5)
+
+    store = open_metadata_store(path)
+    assert [r["id"] for r in store.records()] == ["0", "1"]
+
+    store.append(video(4), "user/4")
+    store.close()
+
+    with open_metadata_store(path) as store:
+        assert [r["id"] for r in store.records()] == ["0", "1", "4"]
+
+
+def test_jsonl_interrupted_write(tmp_path):
+    path = str(tmp_path / "store.jsonl.gz")
+    with open_metadata_store(path) as store:
+        store.append(video(0), "user/0")
+
+    # a write killed half way leaves bytes past the committed length
+    with open(path, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00garbage")
+
+    with open_metadata_store(path) as store:
+        store.append(video(1), "user/1")
+
+    with open_metadata_store(path) as store:
+        assert [r["id"] for r in store.records()] == ["0", "1"]
+
+
+def test_source_urls(store_path):
+    with open_metadata_store(store_path) as store:
+        for i in range(3):
+            store.append(video(i), "user/./%d" % i)
+
+    with open_metadata_store(store_path) as store:
+        urls = store.source_urls(["user/1", "user/2", "user/9"])
+
+    assert urls == {
+        os.path.join("user", "1"): video(1)["video_data"]["webpage_url"],
+        os.path.join("user", "2"): video(2)["video_data"]["webpage_url"],
+    }
+
+
+def test_sqlite_adds_webpage_url_column(tmp_path):
+    path = str(tmp_path / "store.db")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute(
+            "CREATE TABLE metadata (id TEXT PRIMARY KEY, user_id TEXT, "
+            "create_time INTEGER, filepath TEXT, data TEXT)"
+        )
+        connection.execute(
+            "INSERT INTO metadata VALUES (?, ?, ?, ?, ?)",
+            ("1", "u1", 1590000001, "user/1", json.dumps(video(1))),
+        )
+    connection.close()
+
+    with open_metadata_store(path) as store:
+        assert store.source_urls(["user/1"]) == {
+            "user/1": video(1)["video_data"]["webpage_url"]
+        }
@@ -0,0 +1,196 @@
+import hashlib
+import http.client
+import io
+import os
+import socket
+import threading
+
+import pytest
+from requests.exceptions import ChunkedEncodingError, ConnectionError
+from urllib3.exceptions import ProtocolError
+
+from tiktok_dl.transfer import BufferPool, TransferWriter
+
+
+class FakeSocket:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def makefile(self, mode):
+        return io.BytesIO(self.data)
+
+
+def http_response(body: bytes, content_length: int):
+    head = "HTTP/1.1 200 OK\r\nContent-Length: {}\r\n\r\n".format(content_length)
+    response = http.client.HTTPResponse(FakeSocket(head.encode("ascii") + body))
+    response.begin()
+    return response
+
+
+class Raw:
+    """
+    Stand-in for urllib3's HTTPResponse: `_fp` is the http.client
+    response, and its own readinto goes through a temporary bytes object.
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self.decode_content = False
+        self.reads = 0
+
+    def readinto(self, b):
+        self.reads += 1
+        data = self._fp.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+
+class Response:
+    def __init__(self, raw, headers=None):
+        self.raw = raw
+        self.headers = headers or dict()
+
+
+class StalledFile:
+    def readinto(self, b):
+        raise socket.timeout("timed out")
+
+
+class BrokenRaw:
+    decode_content = False
+
+    def readinto(self, b):
+        raise ProtocolError("Connection broken: IncompleteRead")
+
+
+def test_buffer_pool_caps_allocations():
+    pool = BufferPool(chunk_size=16, max_memory=64)
+    buffers = [pool.acquire() for _ in range(4)]
+    assert pool.allocated == 4
+
+    acquired = list()
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+
+    pool.release(buffers[0])
+    waiter.join(1)
+    assert acquired == [buffers[0]]
+    assert pool.allocated == 4
+
+
+def test_buffer_pool_keeps_one_buffer():
+    assert BufferPool(chunk_size=1024, max_memory=1).max_buffers == 1
+
+
+def test_write_reads_http_response_directly(tmp_path):
+    body = os.urandom(100000)
+    raw = Raw(http_response(body, len(body)))
+    writer = TransferWriter(BufferPool(chunk_size=4096, max_memory=8192))
+    digest = hashlib.sha256()
+
+    with open(str(tmp_path / "a.mp4"), "wb") as handle:
+        writer.write(Response(raw), handle, digest)
+
+    assert (tmp_path / "a.mp4").read_bytes() == body
+    assert digest.hexdigest() == hashlib.sha256(body).hexdigest()
+    assert raw.reads == 0
+    assert writer.pool.allocated == 1
+
+
+def test_write_decodes_encoded_response(tmp_path):
+    body = b"x" * 10000
+    raw = Raw(http_response(body, len(body)))
+    writer = TransferWriter(BufferPool(chunk_size=4096, max_memory=8192))
+
+    with open(str(tmp_path / "a.mp4"), "wb") as handle:
+        writer.write(Response(raw, {"Content-Encoding": "gzip"}), handle)
+
+    assert (tmp_path / "a.mp4").read_bytes() == body
+    assert raw.reads > 0
+    assert raw.decode_content
+
+
+def test_truncated_response(tmp_path):
+    raw = Raw(http_response(b"x" * 50, 100))
+    writer = TransferWriter(BufferPool(chunk_size=16, max_memory=64))
+
+    with open(str(tmp_path / "a.mp4"), "wb") as handle:
+        with pytest.raises(ChunkedEncodingError):
+            writer.write(Response(raw), handle)
+    assert len(writer.pool.free) == writer.pool.allocated
+
+
+def test_urllib3_errors_are_translated(tmp_path):
+    writer = TransferWriter(BufferPool(chunk_size=16, max_memory=64))
+    with open(str(tmp_path / "a.mp4"), "wb") as handle:
+        with pytest.raises(ChunkedEncodingError):
+            writer.write(Response(BrokenRaw(), {"Content-Encoding": "gzip"}), handle)
+
+
+def test_stalled_response(tmp_path):
+    writer = TransferWriter(BufferPool(chunk_size=16, max_memory=64))
+    with open(str(tmp_path / "a.mp4"), "wb") as handle:
+        with pytest.raises(ConnectionError):
+            writer.write(Response(Raw(StalledFile())), handle)
+
+
+def test_unknown_fsync_policy():
+    with pytest.raises(ValueError):
+        TransferWriter(BufferPool(), fsync="always")
+
+
+def write_files(tmp_path, writer, count: int):
+    for i in range(count):
+        with open(str(tmp_path / ("%d.mp4" % i)), "wb") as handle:
+            writer.write(Response(Raw(http_response(b"x", 1))), handle)
+
+
+@pytest.fixture
+def fsynced(monkeypatch):
+    calls = list()
+    fsync = os.fsync
+
+    def record(fd):
+        calls.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", record)
+    return calls
+
+
+def test_fsync_none(tmp_path, fsynced):
+    write_files(tmp_path, TransferWriter(BufferPool(), fsync="none"), 3)
+    assert fsynced == []
+
+
+def test_fsync_close(tmp_path, fsynced):
+    write_files(tmp_path, TransferWriter(BufferPool(), fsync="close"), 3)
+    assert len(fsynced) == 3
+
+
+def test_fsync_batch(tmp_path, fsynced):
+    writer = TransferWriter(BufferPool(), fsync="batch", fsync_batch=2)
+    write_files(tmp_path, writer, 3)
+    assert len(fsynced) == 2
+    assert len(writer.pending) == 1
+
+    writer.flush()
+    assert len(fsynced) == 3
+    assert writer.pending == []
+
+
+def test_downloader_removes_partial_file(tmp_path, monkeypatch):
+    from tiktok_dl.downloader import Downloader
+
+    def stream_to_file(url, handle, digest=None):
+        handle.write(b"\x00\x00\x00\x18ftyp")
+        raise ChunkedEncodingError("Connection broken")
+
+    downloader = Downloader(directory_prefix=str(tmp_path))
+    monkeypatch.setattr(downloader, "_stream_to_file", stream_to_file)
+
+    dest = str(tmp_path / "a" / "1.mp4")
+    assert downloader._download_url("https://example/video.mp4", dest) == "missing"
+    assert not os.path.exists(dest)
@@ -0,0 +1,126 @@
+import struct
+
+from tiktok_dl.verify import check_file, verify_tree
+
+
+def atom(atom_type: bytes, body=b""):
+    return struct.pack(">I4s", 8 + len(body), atom_type) + body
+
+
+def large_atom(atom_type: bytes, body=b""):
+    return struct.pack(">I4sQ", 1, atom_type, 16 + len(body)) + body
+
+
+FTYP = atom(b"ftyp", b"isom\x00\x00\x02\x00isomiso2")
+MOOV = atom(b"moov", b"\x00" * 32)
+MP4 = FTYP + MOOV + atom(b"mdat", b"\x01" * 256)
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 256 + b"\xff\xd9"
+
+
+def write(tmp_path, name: str, data: bytes):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_valid_mp4(tmp_path):
+    assert check_file(write(tmp_path, "a.mp4", MP4)) is None
+
+
+def test_mp4_with_64bit_atom_size(tmp_path):
+    data = FTYP + MOOV + large_atom(b"mdat", b"\x01" * 256)
+    assert check_file(write(tmp_path, "a.mp4", data)) is None
+
+
+def test_mp4_with_atom_to_end_of_file(tmp_path):
+    data = FTYP + MOOV + struct.pack(">I4s", 0, b"mdat") + b"\x01" * 256
+    assert check_file(write(tmp_path, "a.mp4", data)) is None
+
+
+def test_truncated_mp4(tmp_path):
+    reason = check_file(write(tmp_path, "a.mp4", MP4[:-10]))
+    assert reason == "truncated, expected {} bytes".format(len(MP4))
+
+
+def test_truncated_mp4_atom_header(tmp_path):
+    reason = check_file(write(tmp_path, "a.mp4", FTYP + MOOV + b"\x00\x00"))
+    assert reason == "truncated atom header at {}".format(len(FTYP + MOOV))
+
+
+def test_truncated_64bit_atom_header(tmp_path):
+    data = FTYP + MOOV + struct.pack(">I4s", 1, b"mdat") + b"\x00\x00"
+    reason = check_file(write(tmp_path, "a.mp4", data))
+    assert reason == "truncated atom header at {}".format(len(FTYP + MOOV))
+
+
+def test_mp4_without_moov(tmp_path):
+    data = FTYP + atom(b"mdat", b"\x01" * 256)
+    assert check_file(write(tmp_path, "a.mp4", data)) == "missing moov atom"
+
+
+def test_html_error_page_as_mp4(tmp_path):
+    data = b"<html><body>403 Forbidden</body></html>"
+    assert check_file(write(tmp_path, "a.mp4", data)) == "missing ftyp atom"
+
+
+def test_mp4_invalid_atom_size(tmp_path):
+    data = FTYP + struct.pack(">I4s", 4, b"moov")
+    assert check_file(write(tmp_path, "a.mp4", data)) == "invalid b'moov' atom size"
+
+
+def test_valid_jpeg(tmp_path):
+    assert check_file(write(tmp_path, "a.jpg", JPEG)) is None
+
+
+def test_truncated_jpeg(tmp_path):
+    reason = check_file(write(tmp_path, "a.jpg", JPEG[:-2]))
+    assert reason == "missing jpeg end marker"
+
+
+def test_not_a_jpeg(tmp_path):
+    reason = check_file(write(tmp_path, "a.jpg", b"<html></html>"))
+    assert reason == "not a jpeg image"
+
+
+def test_webp_cover(tmp_path):
+    body = b"WEBPVP8 " + b"\x00" * 64
+    data = b"RIFF" + struct.pack("<I", len(body)) + body
+    assert check_file(write(tmp_path, "a.jpg", data)) is None
+
+
+def test_truncated_webp_cover(tmp_path):
+    body = b"WEBPVP8 " + b"\x00" * 64
+    data = b"RIFF" + struct.pack("<I", len(body) + 10) + body
+    assert check_file(write(tmp_path, "a.jpg", data)) == "truncated webp"
+
+
+def test_empty_and_missing(tmp_path):
+    assert check_file(write(tmp_path, "a.mp4", b"")) == "empty"
+    assert check_file(str(tmp_path / "b.mp4")) == "missing"
+
+
+def test_content_length_mismatch(tmp_path):
+    reason = check_file(write(tmp_path, "a.mp4", MP4), expected_size=len(MP4) + 1)
+    assert reason == "size {} does not match Content-Length {}".format(
+        len(MP4), len(MP4) + 1
+    )
+
+
+def test_ext_overrides_extension(tmp_path):
+    path = write(tmp_path, "blob", b"<html></html>")
+    assert check_file(path) is None
+    assert check_file(path, ext=".mp4") == "missing ftyp atom"
+
+
+def test_verify_tree(tmp_path):
+    (tmp_path / "user").mkdir()
+    (tmp_path / ".blobs").mkdir()
+    write(tmp_path, "user/good.mp4", MP4)
+    write(tmp_path, "user/good.jpg", JPEG)
+    bad = write(tmp_path, "user/bad.mp4", MP4[:-1])
+    write(tmp_path, ".blobs/skipped.mp4", b"")
+    write(tmp_path, "user/notes.txt", b"")
+
+    assert verify_tree(str(tmp_path), workers=2) == [
+        (bad, "truncated, expected {} bytes".format(len(MP4)))
+    ]
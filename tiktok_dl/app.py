@@ -6,6 +6,7 @@ import os
 
 from loguru import logger
 from tiktok_dl.downloader import Downloader
+from tiktok_dl.metadata import export_sidecars, open_metadata_store
 from tiktok_dl.utils import match_id, valid_url_re
 from tiktok_dl.version import version
 
@@ -39,6 +40,15 @@ def main():
         "Record the IDs of all downloaded videos in it.",
     )
 
+    video_selection_group.add_argument(
+        "--verify",
+        action="store_true",
+        dest="verify",
+        default=False,
+        help="Check downloaded files under the directory prefix, one worker per CPU, "
+        "and re-download broken ones.",
+    )
+
     parallel_download_group = parser.add_argument_group("Parallel Download")
     parallel_download_group.add_argument(
         "-d",
@@ -47,6 +57,22 @@ def main():
         dest="daemon",
         help="Run as daemon.",
     )
+    parallel_download_group.add_argument(
+        "--chunk-size",
+        metavar="BYTES",
+        type=int,
+        dest="chunk_size",
+        default=1048576,
+        help="Size of each reusable transfer buffer.",
+    )
+    parallel_download_group.add_argument(
+        "--max-buffer-memory",
+        metavar="BYTES",
+        type=int,
+        dest="max_buffer_memory",
+        default=67108864,
+        help="Upper bound on transfer buffer memory shared by all downloads.",
+    )
     parallel_download_group.add_argument(
         "-p",
         "--concurrent-count",
@@ -107,6 +133,44 @@ def main():
         default=None,
         help="Directory prefix.",
     )
+    filesystem_group.add_argument(
+        "--fsync",
+        metavar="POLICY",
+        type=str,
+        dest="fsync",
+        choices=["close", "batch", "none"],
+        default="none",
+        help="When to flush downloaded files to disk: 'close' fsyncs every file, "
+        "'batch' fsyncs files in groups of 64, 'none' leaves it to the OS.",
+    )
+    filesystem_group.add_argument(
+        "--metadata-store",
+        metavar="FILENAME",
+        type=str,
+        dest="metadata_store",
+        default=None,
+        help="Append video metadata to a single store instead of one .json file per video. "
+        "Files ending in .sqlite, .sqlite3 or .db are SQLite databases indexed on "
+        "id, user_id and create_time, anything else is an unindexed gzip compressed "
+        "JSON Lines file.",
+    )
+    filesystem_group.add_argument(
+        "--export-json",
+        action="store_true",
+        dest="export_json",
+        default=False,
+        help="Write a .json file per video from the --metadata-store and exit.",
+    )
+    filesystem_group.add_argument(
+        "--dedup",
+        action="store_true",
+        dest="dedup",
+        default=False,
+        help="Keep downloaded media in a content-addressed store under the directory prefix "
+        "and reflink output files to it, falling back to hardlinks. URLs already in the "
+        "store are not fetched again. Editing a hardlinked output file in place also "
+        "changes the stored blob and every other file linked to it.",
+    )
 
     thumbnail_group = parser.add_argument_group("Thumbnail images")
     thumbnail_group.add_argument(
@@ -212,13 +276,19 @@ def main():
     )
     parser.set_defaults(
         batch_file=None,
+        chunk_size=1048576,
         concurrent_count=1,
         daemon=False,
+        dedup=False,
         directory_prefix=None,
         download_archive=None,
         dump_json=False,
+        export_json=False,
+        fsync="none",
         get_url=False,
+        max_buffer_memory=67108864,
         max_sleep_interval=0,
+        metadata_store=None,
         no_check_certificate=False,
         no_overwrite=False,
         no_warnings=False,
@@ -231,13 +301,27 @@ def main():
         sleep_interval=0.2,
         urls=[],
         verbose=True,
+        verify=False,
         write_description=False,
         write_thumbnail=True,
     )
 
     args = parser.parse_args()
 
-    if len(args.urls) == 0 and args.batch_file is None:
+    if args.export_json:
+        if args.metadata_store is None:
+            parser.error("--export-json requires --metadata-store.")
+        with open_metadata_store(args.metadata_store) as store:
+            export_sidecars(store, directory_prefix=args.directory_prefix)
+        return
+
+    if args.chunk_size <= 0:
+        parser.error("--chunk-size must be a positive number of bytes.")
+
+    if args.max_buffer_memory <= 0:
+        parser.error("--max-buffer-memory must be a positive number of bytes.")
+
+    if len(args.urls) == 0 and args.batch_file is None and not args.verify:
         parser.error("URL or file containing list of URLs (--batch-file) is required.")
 
     if args.batch_file is not None and os.path.isfile(args.batch_file):
@@ -249,10 +333,16 @@ def main():
     logger.info('Downloading {} urls', len(args.urls))
 
     t = Downloader(
+        chunk_size=args.chunk_size,
+        dedup=args.dedup,
         directory_prefix=args.directory_prefix,
+        download_archive=args.download_archive,
         dump_json=args.dump_json,
+        fsync=args.fsync,
         get_url=args.get_url,
+        max_buffer_memory=args.max_buffer_memory,
         max_sleep_interval=args.max_sleep_interval,
+        metadata_store=args.metadata_store,
         no_check_certificate=args.no_check_certificate,
         no_overwrite=args.no_overwrite,
         no_warnings=args.no_warnings,
@@ -268,8 +358,13 @@ def main():
         write_thumbnail=args.write_thumbnail,
     )
 
-    for url in args.urls:
-        t.download(url)
+    try:
+        if args.verify:
+            t.verify()
+        for url in args.urls:
+            t.download(url)
+    finally:
+        t.close()
 
 
 if __name__ == "__main__":
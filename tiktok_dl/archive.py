@@ -23,4 +23,15 @@ class ArchiveManager:
         return video_id in self.archive
 
     def append(self, video_id):
-        self._write_archive(list(video_id))
\ No newline at end of file
+        if not self.exist(video_id):
+            self.archive.append(video_id)
+            self._write_archive([video_id])
+
+    def remove(self, video_id):
+        if not self.exist(video_id):
+            return
+        self.archive = [i for i in self.archive if i != video_id]
+        with open(self.download_archive, "w", encoding="utf-8") as f:
+            for i in self.archive:
+                if len(i) > 0:
+                    f.write("%s\n" % i)
@@ -0,0 +1,112 @@
+import errno
+import os
+import shutil
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ioctl request for cloning file extents on Linux (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+class BlobStore:
+    """
+    Content-addressed store for downloaded media. Blobs are kept under
+    `objects/` named by their sha256 digest, and `index` maps every URL
+    seen so far to the digest of its content so known URLs are never
+    fetched twice.
+    """
+
+    def __init__(self, directory: str, fsync=False):
+        self.directory = directory
+        self.fsync = fsync
+        self.index_file = os.path.join(self.directory, "index")
+        os.makedirs(os.path.join(self.directory, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(self.directory, "tmp"), exist_ok=True)
+        self.index = self._read_index()
+
+    def _read_index(self):
+        index = dict()
+        if os.path.isfile(self.index_file):
+            with open(self.index_file, encoding="utf-8") as f:
+                for line in f:
+                    digest, _, url = line.rstrip("\n").partition(" ")
+                    if len(url) > 0:
+                        index[url] = digest
+        return index
+
+    def _write_index(self, url: str, digest: str):
+        with open(self.index_file, "a", encoding="utf-8") as f:
+            f.write("%s %s\n" % (digest, url))
+
+    def _fsync_directory(self, directory: str):
+        # makes the rename into objects/ durable, directories cannot be
+        # opened for fsync on Windows
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def blob_path(self, digest: str):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def temp_path(self):
+        return os.path.join(self.directory, "tmp", uuid.uuid4().hex)
+
+    def lookup(self, url: str):
+        digest = self.index.get(url)
+        if digest is None:
+            return None
+        path = self.blob_path(digest)
+        if not os.path.isfile(path):
+            return None
+        return path
+
+    def add(self, url: str, src: str, digest: str):
+        if os.path.getsize(src) == 0:
+            return None
+
+        path = self.blob_path(digest)
+        if os.path.isfile(path):
+            os.remove(src)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(src, path)
+            if self.fsync:
+                self._fsync_directory(os.path.dirname(path))
+
+        if self.index.get(url) != digest:
+            self.index[url] = digest
+            self._write_index(url, digest)
+        return path
+
+    def link(self, blob: str, dest: str):
+        # a reflink shares extents copy-on-write, so later edits of dest
+        # never reach the blob, unlike a hardlink which is the same inode
+        if fcntl is not None:
+            try:
+                with open(blob, "rb") as src, open(dest, "xb") as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except FileExistsError:
+                return
+            except OSError:
+                if os.path.exists(dest):
+                    os.remove(dest)
+
+        try:
+            os.link(blob, dest)
+            return
+        except FileExistsError:
+            return
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+
+        shutil.copyfile(blob, dest)
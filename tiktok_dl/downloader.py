@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 import re
@@ -6,15 +7,21 @@ import time
 import requests
 import urllib3
 from loguru import logger
+from tiktok_dl.archive import ArchiveManager
+from tiktok_dl.blobstore import BlobStore
 from tiktok_dl.extractor import aweme_extractor
+from tiktok_dl.metadata import open_metadata_store
 from tiktok_dl.schema import aweme_validate
+from tiktok_dl.transfer import BufferPool, TransferWriter
 from tiktok_dl.utils import (
     format_utctime,
+    int_or_none,
     match_id,
     search_regex,
     try_get,
     valid_url_re,
 )
+from tiktok_dl.verify import check_file, verify_tree
 from tiktok_dl.version import version
 
 
@@ -25,10 +32,16 @@ class URLExistsInArchive(Exception):
 class Downloader:
     def __init__(
         self,
+        chunk_size=1048576,
+        dedup=False,
         directory_prefix=None,
+        download_archive=None,
         dump_json=False,
+        fsync="none",
         get_url=False,
+        max_buffer_memory=67108864,
         max_sleep_interval=0,
+        metadata_store=None,
         no_check_certificate=False,
         no_overwrite=False,
         no_warnings=False,
@@ -44,10 +57,16 @@ class Downloader:
         write_thumbnail=True,
         urls=None,
     ):
+        self.chunk_size = chunk_size
+        self.dedup = dedup
         self.directory_prefix = directory_prefix
+        self.download_archive = download_archive
         self.dump_json = dump_json
+        self.fsync = fsync
         self.get_url = get_url
+        self.max_buffer_memory = max_buffer_memory
         self.max_sleep_interval = max_sleep_interval
+        self.metadata_store = metadata_store
         self.no_check_certificate = no_check_certificate
         self.no_overwrite = no_overwrite
         self.no_warnings = no_warnings
@@ -73,6 +92,39 @@ class Downloader:
         self.reaponse_ok = requests.codes.get("ok")
         # urllib3.disable_warnings()
 
+        self.archive = None
+        self.archive_pending = list()
+        if self.download_archive is not None:
+            self.archive = ArchiveManager(self.download_archive)
+
+        self.metadata = None
+        if self.metadata_store is not None:
+            self.metadata = open_metadata_store(self.metadata_store)
+
+        self.writer = TransferWriter(
+            BufferPool(chunk_size=self.chunk_size, max_memory=self.max_buffer_memory),
+            fsync=self.fsync,
+        )
+
+        self.blobs = None
+        if self.dedup:
+            self.blobs = BlobStore(self._expand_path(".blobs"), fsync=self.fsync != "none")
+
+    def close(self):
+        self.writer.flush()
+        if self.metadata is not None:
+            self.metadata.close()
+        self._commit_archive()
+
+    def _commit_archive(self):
+        # video ids are only archived once their metadata is on disk, so a
+        # killed run never archives a video it has no metadata for
+        if self.metadata is not None and len(self.metadata.pending) > 0:
+            return
+        for video_id in self.archive_pending:
+            self.archive.append(video_id)
+        self.archive_pending = list()
+
     def _parse_json(self, json_string: str, video_id: str, fatal=True):
         try:
             return json.loads(json_string)
@@ -89,7 +141,7 @@ class Downloader:
         return r.text
 
     def _fetch_data(self, url: str):
-        video_id = match_id(url, valid_url_re)
+        video_id = match_id(url, valid_url_re())
 
         webpage = self._download_webpage(
             url, video_id, note="Downloading video webpage"
@@ -152,41 +204,165 @@ class Downloader:
         except FileNotFoundError:
             pass
 
+        if self.blobs is not None:
+            return self._download_blob(url, dest)
+
+        expected_size = None
         try:
             with open(dest, "xb") as handle:
-                response = requests.get(url, stream=True, timeout=160)
-                if response.status_code != self.reaponse_ok:
-                    response.raise_for_status()
-
                 logger.debug("Downloading to {}".format(dest))
-                for data in response.iter_content(chunk_size=4194304):
-                    handle.write(data)
+                expected_size = self._stream_to_file(url, handle)
                 handle.close()
         except FileExistsError:
             pass
-        except requests.exceptions.RequestException:
-            logger.error("File {} not found on Server {}".format(dest, url))
-            pass
-
-        if os.path.getsize(dest) == 0:
+        except requests.exceptions.RequestException as e:
+            logger.error("Failed to download {} from {}: {}".format(dest, url, e))
             os.remove(dest)
 
+        reason = check_file(dest, expected_size)
+        if reason is not None:
+            logger.error("File {} is broken: {}".format(dest, reason))
+            if os.path.exists(dest):
+                os.remove(dest)
+        return reason
+
+    def _stream_to_file(self, url: str, handle, digest=None):
+        response = requests.get(url, stream=True, timeout=160)
+        if response.status_code != self.reaponse_ok:
+            response.raise_for_status()
+
+        try:
+            self.writer.write(response, handle, digest)
+        finally:
+            response.close()
+        if "Content-Encoding" in response.headers:
+            return None
+        return int_or_none(response.headers.get("Content-Length"))
+
+    def _download_blob(self, url: str, dest: str):
+        ext = os.path.splitext(dest)[1]
+        if os.path.exists(dest):
+            reason = check_file(dest)
+            if reason is not None:
+                logger.error("File {} is broken: {}".format(dest, reason))
+                os.remove(dest)
+            return reason
+
+        blob = self.blobs.lookup(url)
+        if blob is not None and check_file(blob, ext=ext) is not None:
+            os.remove(blob)
+            blob = None
+
+        reason = None
+        if blob is not None:
+            logger.debug("Linking {} from blob store".format(dest))
+        else:
+            tmp = self.blobs.temp_path()
+            digest = hashlib.sha256()
+            try:
+                with open(tmp, "wb") as handle:
+                    logger.debug("Downloading to {}".format(dest))
+                    expected_size = self._stream_to_file(url, handle, digest)
+                reason = check_file(tmp, expected_size, ext=ext)
+                if reason is None:
+                    blob = self.blobs.add(url, tmp, digest.hexdigest())
+                else:
+                    logger.error("File {} is broken: {}".format(dest, reason))
+            except requests.exceptions.RequestException as e:
+                logger.error("Failed to download {} from {}: {}".format(dest, url, e))
+                reason = "missing"
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+        if blob is not None:
+            self.blobs.link(blob, dest)
+        return reason
+
     def _download_media(self, video_data: dict, filepath: str):
         video_url = video_data["play_urls"][0]
-        self._download_url(video_url, self._expand_path(filepath + ".mp4"))
         cover_url = video_data["thumbnails"][0]
-        self._download_url(cover_url, self._expand_path(filepath + ".jpg"))
+        return {
+            "video": self._download_url(video_url, self._expand_path(filepath + ".mp4")),
+            "thumbnail": self._download_url(cover_url, self._expand_path(filepath + ".jpg")),
+        }
+
+    def _source_urls(self, paths: list):
+        urls = dict()
+        stored = dict()
+        for path in paths:
+            filepath = os.path.splitext(path)[0]
+            sidecar = filepath + ".json"
+            if os.path.isfile(sidecar):
+                with open(sidecar, encoding="utf-8") as f:
+                    data = json.load(f)
+                urls[path] = try_get(data, lambda x: x["video_data"]["webpage_url"], str)
+            else:
+                stored[os.path.relpath(filepath, self.directory_prefix or ".")] = path
+
+        if self.metadata is not None and len(stored) > 0:
+            self.metadata.flush()
+            self._commit_archive()
+            for filepath, url in self.metadata.source_urls(list(stored)).items():
+                urls[stored[filepath]] = url
+        return urls
+
+    def verify(self, workers=None):
+        if workers is None:
+            workers = os.cpu_count() or 4
+
+        broken = verify_tree(self.directory_prefix or ".", workers=workers)
+        paths = [os.path.normpath(path) for path, _ in broken]
+        sources = self._source_urls(paths)
 
-    def download(self, url: str):
+        urls = list()
+        for path, (_, reason) in zip(paths, broken):
+            logger.warning("File {} is broken: {}".format(path, reason))
+            url = sources.get(path)
+            if url is None:
+                logger.error("Unable to find the source URL of {}, keeping it".format(path))
+                continue
+
+            os.remove(path)
+            if url not in urls:
+                urls.append(url)
+
+        logger.info("Re-downloading {} broken videos", len(urls))
+        for url in urls:
+            self.download(url, force=True)
+        return urls
+
+    def download(self, url: str, force=False):
         try:
+            video_id = match_id(url, valid_url_re())
+            if self.archive is not None and self.archive.exist(video_id):
+                if not force:
+                    raise URLExistsInArchive("Video already in archive " + video_id)
+                self.archive.remove(video_id)
+
             data = self._fetch_data(url)
             aweme_validate(data.get("video_data"))
             filepath = self._output_format(data.get("video_data"))
-            self._download_media(data.get("video_data"), filepath)
-            self._save_json(data, self._expand_path(filepath + ".json"))
+            data["verify"] = self._download_media(data.get("video_data"), filepath)
+            if self.metadata is not None:
+                self.metadata.append(data, filepath)
+            else:
+                self._save_json(data, self._expand_path(filepath + ".json"))
+
+            if self.archive is not None and all(
+                r is None for r in data["verify"].values()
+            ):
+                self.archive_pending.append(video_id)
+                self._commit_archive()
+        except URLExistsInArchive as e:
+            logger.info(e)
+            pass
         except requests.exceptions.InvalidURL as e:
             logger.error(e)
             pass
+        except requests.exceptions.RequestException as e:
+            logger.error(e)
+            pass
         except ConnectionError as e:
             logger.error(e)
             pass
@@ -1,58 +1,135 @@
-from datetime import datetime
+from tiktok_dl.utils import format_utctime, int_or_none, str_or_none
 
-from tiktok_dl.utils import int_or_none, str_or_none, try_get
+
+def _typed(expected_type):
+    def convert(v):
+        return v if isinstance(v, expected_type) else None
+
+    return convert
+
+
+def _int(v):
+    try:
+        return int(v)
+    except TypeError:
+        return None
+
+
+def _ext(record):
+    return "mp4"
+
+
+def _upload_date(record):
+    return format_utctime(time=record.create_time, fmt="%Y%m%d")
+
+
+def _title(record):
+    return "{} on TikTok".format(record.nick_name)
+
+
+def _user_url(record):
+    return "https://www.tiktok.com/@" + record.unique_id
+
+
+def _webpage_url(record):
+    return "https://www.tiktok.com/@{}/video/{}?source=h5_t".format(
+        record.unique_id, record.id
+    )
+
+
+# field name -> (path from the page props, converter), in output order.
+# Derived fields have no path and are computed from the extracted record
+# once every path field is set.
+AWEME_FIELDS = (
+    ("id", ("videoData", "itemInfos", "id"), str_or_none),
+    ("play_urls", ("videoData", "itemInfos", "video", "urls"), _typed(list)),
+    ("ext", None, _ext),
+    ("width", ("videoData", "itemInfos", "video", "videoMeta", "width"), _typed(int)),
+    ("height", ("videoData", "itemInfos", "video", "videoMeta", "height"), _typed(int)),
+    ("duration", ("videoData", "itemInfos", "video", "videoMeta", "duration"), _typed(int)),
+    ("thumbnails", ("videoData", "itemInfos", "covers"), _typed(list)),
+    ("comment_count", ("videoData", "itemInfos", "commentCount"), int_or_none),
+    ("digg_count", ("videoData", "itemInfos", "diggCount"), int_or_none),
+    ("share_count", ("videoData", "itemInfos", "shareCount"), int_or_none),
+    ("play_count", ("videoData", "itemInfos", "playCount"), int_or_none),
+    ("create_time", ("videoData", "itemInfos", "createTime"), _int),
+    ("upload_date", None, _upload_date),
+    ("title", None, _title),
+    ("description", ("shareMeta", "desc"), str_or_none),
+    ("nick_name", ("videoData", "authorInfos", "nickName"), str_or_none),
+    ("unique_id", ("videoData", "authorInfos", "uniqueId"), str_or_none),
+    ("sec_uid", ("videoData", "authorInfos", "secUid"), str_or_none),
+    ("user_id", ("videoData", "authorInfos", "userId"), str_or_none),
+    ("user_url", None, _user_url),
+    ("profile_pics", ("videoData", "authorInfos", "covers"), _typed(list)),
+    ("webpage_url", None, _webpage_url),
+    ("follower_count", ("videoData", "authorStats", "followerCount"), int_or_none),
+    ("heart_total", ("videoData", "authorStats", "heartCount"), str_or_none),
+    ("challenge_list", ("videoData", "challengeInfoList"), _typed(list)),
+    ("duet_info", ("videoData", "duetInfo"), _typed(str)),
+    ("text_extra", ("videoData", "textExtra"), _typed(list)),
+    ("music_id", ("videoData", "musicInfos", "musicId"), str_or_none),
+    ("music_title", ("videoData", "musicInfos", "musicName"), str_or_none),
+    ("music_artist", ("videoData", "musicInfos", "authorName"), str_or_none),
+    ("music_covers", ("videoData", "musicInfos", "covers"), _typed(list)),
+)
+
+
+class AwemeRecord:
+    __slots__ = tuple(name for name, _, _ in AWEME_FIELDS)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _compile(fields):
+    """
+    Split the field paths into the intermediate dicts they pass through
+    and the final key of each field. Every intermediate dict is listed
+    once, after its parent, so a page is resolved with one lookup per
+    dict however many fields share its prefix.
+    """
+    index = {(): 0}
+    steps = list()
+    leaves = list()
+    derived = list()
+    for name, path, convert in fields:
+        if path is None:
+            derived.append((name, convert))
+            continue
+        for depth in range(1, len(path)):
+            prefix = path[:depth]
+            if prefix not in index:
+                index[prefix] = len(index)
+                steps.append((index[prefix[:-1]], prefix[-1]))
+        leaves.append((name, index[path[:-1]], path[-1], convert))
+    return tuple(steps), tuple(leaves), tuple(derived)
+
+
+AWEME_STEPS, AWEME_LEAVES, AWEME_DERIVED = _compile(AWEME_FIELDS)
+
+
+def aweme_extract_record(video_data: dict):
+    nodes = [video_data]
+    for parent, key in AWEME_STEPS:
+        node = nodes[parent]
+        nodes.append(node.get(key) if isinstance(node, dict) else None)
+
+    record = AwemeRecord()
+    for name, parent, key, convert in AWEME_LEAVES:
+        node = nodes[parent]
+        setattr(record, name, convert(node.get(key) if isinstance(node, dict) else None))
+    for name, derive in AWEME_DERIVED:
+        setattr(record, name, derive(record))
+    return record
 
 
 def aweme_extractor(video_data: dict):
-    video_info = try_get(video_data, lambda x: x["videoData"]["itemInfos"], dict)
-    author_info = try_get(video_data, lambda x: x["videoData"]["authorInfos"], dict)
-    share_info = try_get(video_data, lambda x: x["shareMeta"], dict)
-    music_info = try_get(video_data, lambda x: x["videoData"]["musicInfos"], dict)
-    author_stats = try_get(video_data, lambda x: x["videoData"]["authorStats"], dict)
-
-    unique_id = str_or_none(author_info.get("uniqueId"))
-    timestamp = try_get(video_info, lambda x: int(x["createTime"]), int)
-    date = datetime.utcfromtimestamp(timestamp).strftime("%Y%m%d")
-
-    height = try_get(video_info, lambda x: x["video"]["videoMeta"]["height"], int)
-    width = try_get(video_info, lambda x: x["video"]["videoMeta"]["width"], int)
-
-    return {
-        "id": str_or_none(video_info.get("id")),
-        "play_urls": try_get(video_info, lambda x: x["video"]["urls"], list),
-        "ext": "mp4",
-        "width": width,
-        "height": height,
-        "duration": try_get(
-            video_info, lambda x: x["video"]["videoMeta"]["duration"], int
-        ),
-        "thumbnails": try_get(video_info, lambda x: x["covers"], list),
-        "comment_count": int_or_none(video_info.get("commentCount")),
-        "digg_count": int_or_none(video_info.get("diggCount")),
-        "share_count": int_or_none(video_info.get("shareCount")),
-        "play_count": int_or_none(video_info.get("playCount")),
-        "create_time": timestamp,
-        "upload_date": date,
-        "title": "{} on TikTok".format(str_or_none(author_info.get("nickName"))),
-        "description": str_or_none(share_info.get("desc")),
-        "nick_name": str_or_none(author_info.get("nickName")),
-        "unique_id": unique_id,
-        "sec_uid": str_or_none(author_info.get("secUid")),
-        "user_id": str_or_none(author_info.get("userId")),
-        "user_url": "https://www.tiktok.com/@" + unique_id,
-        "profile_pics": try_get(author_info, lambda x: x["covers"], list),
-        "webpage_url": "https://www.tiktok.com/@{}/video/{}?source=h5_t".format(
-            str_or_none(author_info.get("uniqueId")), str_or_none(video_info.get("id"))
-        ),
-        "follower_count": int_or_none(author_stats.get("followerCount")),
-        "heart_total": str_or_none(author_stats.get("heartCount")),
-        "challenge_list": try_get(
-            video_data, lambda x: x["videoData"]["challengeInfoList"], list
-        ),
-        "duet_info": try_get(video_data, lambda x: x["videoData"]["duetInfo"], str),
-        "text_extra": try_get(video_data, lambda x: x["videoData"]["textExtra"], list),
-        "music_id": str_or_none(music_info.get("musicId")),
-        "music_title": str_or_none(music_info.get("musicName")),
-        "music_artist": str_or_none(music_info.get("authorName")),
-        "music_covers": try_get(music_info, lambda x: x["covers"], list),
-    }
+    return aweme_extract_record(video_data).as_dict()
+
+
+def aweme_extract_many(pages, as_dict=True):
+    records = map(aweme_extract_record, pages)
+    if as_dict:
+        return [record.as_dict() for record in records]
+    return list(records)
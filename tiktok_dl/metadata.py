@@ -0,0 +1,269 @@
+import gzip
+import json
+import os
+import sqlite3
+import zlib
+from abc import ABC, abstractmethod
+
+from loguru import logger
+
+
+class MetadataStore(ABC):
+    def __init__(self, path: str, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = list()
+
+    def _record(self, data: dict, filepath: str):
+        video_data = data.get("video_data") or dict()
+        return {
+            "id": video_data.get("id"),
+            "user_id": video_data.get("user_id"),
+            "create_time": video_data.get("create_time"),
+            "filepath": os.path.normpath(filepath),
+            "webpage_url": video_data.get("webpage_url"),
+            "data": data,
+        }
+
+    @abstractmethod
+    def _write_batch(self, records: list):
+        pass
+
+    def append(self, data: dict, filepath: str):
+        self.pending.append(self._record(data, filepath))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.pending) == 0:
+            return
+        self._write_batch(self.pending)
+        logger.debug("Wrote {} metadata records to {}", len(self.pending), self.path)
+        self.pending = list()
+
+    @abstractmethod
+    def records(self):
+        pass
+
+    @abstractmethod
+    def source_urls(self, filepaths: list):
+        """
+        Map each of `filepaths` that is in the store to its webpage URL.
+        """
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class JsonLinesMetadataStore(MetadataStore):
+    """
+    Append-only gzip compressed JSON Lines file. Each flush appends one
+    complete gzip member and then records the committed length in a
+    `.len` file next to it. On open, anything past the last complete
+    member is cut off, so an interrupted write never makes later batches
+    unreadable. There is no index, lookups have to scan the whole file.
+    """
+
+    def __init__(self, path: str, batch_size=500):
+        super().__init__(path, batch_size=batch_size)
+        self.length_file = self.path + ".len"
+        self._repair()
+
+    def _read_length(self):
+        try:
+            with open(self.length_file) as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_length(self, length: int):
+        tmp = self.length_file + ".tmp"
+        with open(tmp, "w") as f:
+            f.write("%d\n" % length)
+        os.replace(tmp, self.length_file)
+
+    def _valid_length(self):
+        # offset just past the last gzip member that decompresses fully
+        valid = 0
+        offset = 0
+        decompressor = zlib.decompressobj(31)
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(1048576), b""):
+                while len(chunk) > 0:
+                    try:
+                        decompressor.decompress(chunk)
+                    except zlib.error:
+                        return valid
+                    if not decompressor.eof:
+                        offset += len(chunk)
+                        break
+                    offset += len(chunk) - len(decompressor.unused_data)
+                    valid = offset
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(31)
+        return valid
+
+    def _repair(self):
+        if not os.path.isfile(self.path):
+            return
+        size = os.path.getsize(self.path)
+        if self._read_length() == size:
+            return
+
+        valid = self._valid_length()
+        if valid != size:
+            logger.warning(
+                "Truncating {} from {} to {} bytes after an incomplete write",
+                self.path,
+                size,
+                valid,
+            )
+            with open(self.path, "r+b") as f:
+                f.truncate(valid)
+        self._write_length(valid)
+
+    def _write_batch(self, records: list):
+        lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        member = gzip.compress(lines.encode("utf-8"))
+        with open(self.path, "ab") as f:
+            f.write(member)
+            f.flush()
+            os.fsync(f.fileno())
+            length = f.tell()
+        self._write_length(length)
+
+    def records(self):
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if len(line.strip()) > 0:
+                        yield json.loads(line)
+        except (EOFError, OSError, zlib.error) as e:
+            logger.warning("Stopped reading {} at a damaged batch: {}", self.path, e)
+
+    def source_urls(self, filepaths: list):
+        wanted = set(os.path.normpath(p) for p in filepaths)
+        urls = dict()
+        for record in self.records():
+            if record["filepath"] in wanted:
+                urls[record["filepath"]] = record.get("webpage_url") or (
+                    record["data"].get("video_data") or dict()
+                ).get("webpage_url")
+        return urls
+
+
+class SQLiteMetadataStore(MetadataStore):
+    """
+    SQLite database with one row per video, indexed on id, user_id,
+    create_time and filepath. Each batch is written in a single transaction.
+    """
+
+    def __init__(self, path: str, batch_size=500):
+        super().__init__(path, batch_size=batch_size)
+        self.connection = sqlite3.connect(self.path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "id TEXT PRIMARY KEY, user_id TEXT, create_time INTEGER, "
+                "filepath TEXT, data TEXT, webpage_url TEXT)"
+            )
+            columns = [r[1] for r in self.connection.execute("PRAGMA table_info(metadata)")]
+            if "webpage_url" not in columns:
+                self.connection.execute("ALTER TABLE metadata ADD COLUMN webpage_url TEXT")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS metadata_user_id ON metadata (user_id)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS metadata_create_time ON metadata (create_time)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS metadata_filepath ON metadata (filepath)"
+            )
+
+    def _write_batch(self, records: list):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO metadata "
+                "(id, user_id, create_time, filepath, webpage_url, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        r["id"],
+                        r["user_id"],
+                        r["create_time"],
+                        r["filepath"],
+                        r["webpage_url"],
+                        json.dumps(r["data"], ensure_ascii=False),
+                    )
+                    for r in records
+                ],
+            )
+
+    def records(self):
+        cursor = self.connection.execute(
+            "SELECT id, user_id, create_time, filepath, webpage_url, data FROM metadata"
+        )
+        for row in cursor:
+            yield {
+                "id": row[0],
+                "user_id": row[1],
+                "create_time": row[2],
+                "filepath": row[3],
+                "webpage_url": row[4],
+                "data": json.loads(row[5]),
+            }
+
+    def source_urls(self, filepaths: list):
+        filepaths = [os.path.normpath(p) for p in filepaths]
+        urls = dict()
+        # stay below SQLite's limit on bound parameters
+        for start in range(0, len(filepaths), 500):
+            batch = filepaths[start : start + 500]
+            cursor = self.connection.execute(
+                "SELECT filepath, webpage_url, data FROM metadata "
+                "WHERE filepath IN ({})".format(", ".join("?" * len(batch))),
+                batch,
+            )
+            for filepath, webpage_url, data in cursor:
+                if webpage_url is None:
+                    # rows written before the column existed
+                    webpage_url = (json.loads(data).get("video_data") or dict()).get(
+                        "webpage_url"
+                    )
+                urls[filepath] = webpage_url
+        return urls
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+
+def open_metadata_store(path: str, batch_size=500):
+    if path.endswith((".sqlite", ".sqlite3", ".db")):
+        return SQLiteMetadataStore(path, batch_size=batch_size)
+    return JsonLinesMetadataStore(path, batch_size=batch_size)
+
+
+def export_sidecars(store: MetadataStore, directory_prefix=None):
+    count = 0
+    for record in store.records():
+        dest = record["filepath"] + ".json"
+        if directory_prefix is not None:
+            dest = os.path.join(directory_prefix, dest)
+        if os.path.dirname(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+        with open(dest, "w", encoding="utf-8") as f:
+            json.dump(record["data"], f, ensure_ascii=False)
+        count += 1
+
+    logger.info("Exported {} metadata records", count)
+    return count
@@ -0,0 +1,133 @@
+import http.client
+import os
+import socket
+import threading
+
+from requests.exceptions import ChunkedEncodingError, ContentDecodingError
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+from urllib3.exceptions import HTTPError as BaseHTTPError
+
+FSYNC_POLICIES = ("close", "batch", "none")
+
+
+class BufferPool:
+    """
+    Fixed set of reusable transfer buffers shared by all workers. At most
+    `max_memory // chunk_size` buffers ever exist, callers block in
+    `acquire` until one is released, so in-flight memory stays bounded
+    regardless of the number of concurrent transfers.
+    """
+
+    def __init__(self, chunk_size=1048576, max_memory=67108864):
+        self.chunk_size = chunk_size
+        self.max_buffers = max(1, max_memory // chunk_size)
+        self.free = list()
+        self.allocated = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while len(self.free) == 0 and self.allocated >= self.max_buffers:
+                self.condition.wait()
+            if len(self.free) > 0:
+                return self.free.pop()
+            self.allocated += 1
+        return bytearray(self.chunk_size)
+
+    def release(self, buffer: bytearray):
+        with self.condition:
+            self.free.append(buffer)
+            self.condition.notify()
+
+
+class TransferWriter:
+    def __init__(self, pool: BufferPool, fsync="none", fsync_batch=64):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy {}".format(fsync))
+        self.pool = pool
+        self.fsync = fsync
+        self.fsync_batch = fsync_batch
+        self.pending = list()
+        self.lock = threading.Lock()
+
+    def _source(self, response):
+        # urllib3's readinto() reads into a temporary bytes object and
+        # copies it over, so read from the underlying http.client response
+        # when no content decoding is needed
+        fp = getattr(response.raw, "_fp", None)
+        encoding = response.headers.get("Content-Encoding", "identity")
+        if fp is not None and hasattr(fp, "readinto") and encoding == "identity":
+            return fp
+        response.raw.decode_content = True
+        return response.raw
+
+    def _readinto(self, source, view):
+        # translate transport errors the way iter_content does, so callers
+        # only have to handle requests exceptions
+        try:
+            return source.readinto(view)
+        except (ProtocolError, http.client.HTTPException) as e:
+            raise ChunkedEncodingError(e)
+        except DecodeError as e:
+            raise ContentDecodingError(e)
+        except (ReadTimeoutError, socket.timeout) as e:
+            raise RequestsConnectionError(e)
+        except (BaseHTTPError, ConnectionError) as e:
+            raise RequestsConnectionError(e)
+
+    def _read_chunk(self, source, handle, digest):
+        # buffers are held per chunk rather than per transfer, so the pool
+        # caps the memory in flight and not the number of transfers
+        buffer = self.pool.acquire()
+        view = memoryview(buffer)
+        try:
+            size = self._readinto(source, view)
+            if size:
+                handle.write(view[:size])
+                if digest is not None:
+                    digest.update(view[:size])
+            return size
+        finally:
+            view.release()
+            self.pool.release(buffer)
+
+    def write(self, response, handle, digest=None):
+        source = self._source(response)
+        while self._read_chunk(source, handle, digest):
+            pass
+
+        # http.client's readinto() ends quietly when the server closes the
+        # connection early, unlike urllib3 which checks Content-Length
+        remaining = getattr(source, "length", None)
+        if source is not response.raw and remaining:
+            raise ChunkedEncodingError(http.client.IncompleteRead(b"", remaining))
+
+        self._sync(handle)
+
+    def _sync(self, handle):
+        if self.fsync == "none":
+            return
+
+        handle.flush()
+        if self.fsync == "close":
+            os.fsync(handle.fileno())
+            return
+
+        # keep a duplicate descriptor, the file may be renamed or closed
+        # before the batch is synced
+        with self.lock:
+            self.pending.append(os.dup(handle.fileno()))
+            if len(self.pending) < self.fsync_batch:
+                return
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending = self.pending
+            self.pending = list()
+        for fd in pending:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
@@ -0,0 +1,99 @@
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+VERIFY_EXTENSIONS = (".mp4", ".jpg")
+
+
+def _check_mp4(f, size: int):
+    # walk the top level atoms by seeking over their bodies, so only the
+    # 8 or 16 byte headers are read no matter how large the file is
+    offset = 0
+    atoms = set()
+    while offset < size:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return "truncated atom header at {}".format(offset)
+
+        atom_size, atom_type = struct.unpack(">I4s", header)
+        if offset == 0 and atom_type != b"ftyp":
+            return "missing ftyp atom"
+        if atom_size == 1:
+            extended = f.read(8)
+            if len(extended) < 8:
+                return "truncated atom header at {}".format(offset)
+            atom_size = struct.unpack(">Q", extended)[0]
+        elif atom_size == 0:
+            atom_size = size - offset
+        if atom_size < 8:
+            return "invalid {} atom size".format(atom_type)
+
+        atoms.add(atom_type)
+        offset += atom_size
+
+    if offset != size:
+        return "truncated, expected {} bytes".format(offset)
+    if b"moov" not in atoms:
+        return "missing moov atom"
+    return None
+
+
+def _check_jpg(f, size: int):
+    head = f.read(12)
+    # covers are sometimes served as webp despite the .jpg extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        if struct.unpack("<I", head[4:8])[0] + 8 > size:
+            return "truncated webp"
+        return None
+    if head[:3] != b"\xff\xd8\xff":
+        return "not a jpeg image"
+
+    f.seek(max(0, size - 32))
+    if b"\xff\xd9" not in f.read():
+        return "missing jpeg end marker"
+    return None
+
+
+def check_file(path: str, expected_size=None, ext=None):
+    """
+    Return the reason `path` is broken, or None if it looks complete.
+    `ext` overrides the container type implied by the file extension.
+    """
+    if ext is None:
+        ext = os.path.splitext(path)[1]
+
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return "missing"
+    if size == 0:
+        return "empty"
+    if expected_size is not None and size != expected_size:
+        return "size {} does not match Content-Length {}".format(size, expected_size)
+
+    with open(path, "rb") as f:
+        if ext == ".mp4":
+            return _check_mp4(f, size)
+        if ext == ".jpg":
+            return _check_jpg(f, size)
+    return None
+
+
+def _walk(directory: str):
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in files:
+            if name.endswith(VERIFY_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def verify_tree(directory: str, workers=4):
+    """
+    Check every media file below `directory` in parallel and return a
+    list of (path, reason) tuples for the broken ones.
+    """
+    paths = list(_walk(directory))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(check_file, paths)
+        return [(p, r) for p, r in zip(paths, results) if r is not None]